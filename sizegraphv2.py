@@ -1,111 +1,494 @@
-from dataclasses import dataclass, field
-from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Tuple
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from operator import attrgetter
+import errno
+import logging
 import os
+import stat
 import sys
 import math
-from PySide6.QtWidgets import (QApplication, QMainWindow, QGraphicsView, 
-                              QGraphicsScene, QVBoxLayout, QHBoxLayout, QWidget, 
-                              QLabel, QTreeView, QPushButton, QFileSystemModel, 
-                              QSizePolicy)
-from PySide6.QtCore import Qt, QRectF, QDir
-from PySide6.QtGui import QBrush, QColor, QLinearGradient, QPen
+import threading
+import time
+from PySide6.QtWidgets import (QApplication, QMainWindow, QVBoxLayout, 
+                              QHBoxLayout, QWidget, QLabel, QTreeView, 
+                              QPushButton, QFileSystemModel, QSizePolicy)
+from PySide6.QtCore import Qt, QRectF, QDir, QObject, QThread, QTimer, Signal
+from PySide6.QtGui import (QBrush, QColor, QGradient, QLinearGradient, QPainter, 
+                           QPen, QPixmap)
 import psutil
 
-@dataclass
+logger = logging.getLogger(__name__)
+
+# Number of threads scanning directories in parallel. Raise this for network
+# shares (SMB/NFS), where each scandir call mostly waits on latency. Can be
+# overridden with the SIZEGRAPH_SCAN_WORKERS environment variable.
+SCAN_WORKERS = 16
+try:
+    SCAN_WORKERS = max(1, int(os.environ.get("SIZEGRAPH_SCAN_WORKERS", SCAN_WORKERS)))
+except ValueError:
+    logger.warning("Ignoring SIZEGRAPH_SCAN_WORKERS=%r, expected a number",
+                   os.environ["SIZEGRAPH_SCAN_WORKERS"])
+
+# Seconds between progress updates while scanning
+PROGRESS_INTERVAL = 0.1
+
+# Directories that couldn't be listed are remembered for this many seconds, so
+# repeated scans don't probe them again, up to this many entries
+FAILED_DIR_TTL = 30.0
+FAILED_DIR_CACHE_SIZE = 100_000
+
+# Seconds between partial trees handed to the UI while scanning
+PARTIAL_INTERVAL = 0.5
+
+# Partial trees are only drawn this many folder levels deep, and at least this
+# many seconds apart (or as long apart as the last one took to draw), so the
+# GUI stays responsive during a scan
+PARTIAL_MAX_DEPTH = 3
+PARTIAL_MIN_GAP = 0.25
+
+# Cell size in pixels of the grid used to find the file under the mouse
+HIT_GRID_CELL = 32
+
+# Children that would get less than this many square pixels are not laid out
+# one by one, they are lumped together into a single gray block per directory
+MIN_CHILD_AREA = 2
+
+# Directories drawn smaller than this many square pixels are not subdivided,
+# they are drawn as a solid block instead
+MIN_RECT_AREA = 16
+
 class FileInfo:
-    path: Path
-    size: int = 0
-    is_dir: bool = False
-    children: List['FileInfo'] = field(default_factory=list)
-    parent: Optional['FileInfo'] = field(default=None, repr=False)
-    percentage: float = 0.0
-
-def traverse_directory(path: Path, parent: Optional[FileInfo] = None, 
-                      counter: list = None, 
-                      progress_callback = None) -> FileInfo:
-    # Initialize counter on first call
-    if counter is None:
-        counter = [0]
-    
-    counter[0] += 1
-    if counter[0] % 5000 == 0: 
-        print(f"Scanned {counter[0]} files") 
-        process = psutil.Process()
-        mem_usage = process.memory_info().rss / 1024 / 1024
-        if progress_callback:
-            progress_callback(counter[0], mem_usage)
-    
-    path_obj = Path(path)
-    is_dir = os.path.isdir(path)
+    # A plain class with __slots__ rather than a dataclass: no per-instance
+    # __dict__, which matters with millions of nodes in a scan.
+    # Only a tree's root keeps its full path. Every other node just has its
+    # name and the path is rebuilt from the parents when asked for, instead
+    # of storing the same directory prefix over and over.
+    __slots__ = ('_root_path', 'name', 'size', 'is_dir', 'children', 'parent')
+
+    def __init__(self, path: Optional[str] = None, size: int = 0, is_dir: bool = False,
+                 children: Optional[List['FileInfo']] = None,
+                 parent: Optional['FileInfo'] = None, name: Optional[str] = None):
+        self._root_path = path if parent is None else None
+        # The scanner passes DirEntry.name, which readdir already provides
+        self.name = name if name is not None else (os.path.basename(path) or path)
+        self.size = size
+        self.is_dir = is_dir
+        self.children = children if children is not None else []
+        self.parent = parent
+
+    @property
+    def path(self) -> str:
+        names = []
+        node = self
+        while node.parent is not None:
+            names.append(node.name)
+            node = node.parent
+        names.append(node._root_path)
+        return os.path.join(*reversed(names))
+
+    @property
+    def percentage(self) -> float:
+        # Share of the whole scanned tree, worked out when asked for instead of
+        # stored on every node after each scan
+        root = self
+        while root.parent is not None:
+            root = root.parent
+        return self.size * 100.0 / root.size if root.size > 0 else 0.0
+
+    def __repr__(self) -> str:
+        return f"FileInfo(path={self.path!r}, size={self.size}, is_dir={self.is_dir})"
+
+class PartialFileInfo(FileInfo):
+    # Copy of a directory that was still being scanned when a partial tree
+    # was taken, so the treemap can mark it as incomplete
+    __slots__ = ()
+
+def traverse_directory(path: str, progress_callback = None, 
+                      max_workers: int = SCAN_WORKERS,
+                      partial_callback = None,
+                      stop_event: Optional[threading.Event] = None) -> FileInfo:
+    path = os.fspath(path)
     
+    # The root is the only entry that needs an explicit stat, everything
+    # below it comes from os.scandir
     try:
-        size = os.stat(path).st_size if not is_dir else 0
+        st = os.stat(path)
     except (PermissionError, OSError):
-        return FileInfo(path=path_obj, size=0, is_dir=is_dir, parent=parent)
+        return FileInfo(path=path)
     
-    obj = FileInfo(path=path_obj, is_dir=is_dir, size=size, parent=parent)
+    is_dir = stat.S_ISDIR(st.st_mode)
+    root = FileInfo(path=path, is_dir=is_dir, size=0 if is_dir else st.st_size)
+    if not is_dir:
+        return root
     
-    if is_dir:
-        try:
-            entries = list(os.scandir(path))
-            obj.children = [None] * len(entries)
-            obj.children = [traverse_directory(entry.path, parent=obj, counter=counter, progress_callback=progress_callback) for entry in entries]
-            obj.size = sum(child.size for child in obj.children)
-        except (PermissionError, OSError):
-            pass
+    # Directories are scanned by a pool of worker threads (scandir/stat release
+    # the GIL), while this thread hands out new directories and reports progress.
+    # Each directory's children are only touched by the worker scanning it, so
+    # no locking is needed.
+    # Waiting directories are kept on a LIFO stack so the scan goes depth-first
+    # and only a bounded number of tasks sit in the executor at any time.
+    # Sizes are rolled up as the scan goes: a worker sets a directory's size to
+    # the total of its files, and once all of its subdirectories are finished
+    # too that size is added to the parent. unfinished counts the subdirectories
+    # still outstanding per directory.
+    # If partial_callback is given it's called every PARTIAL_INTERVAL with a
+    # snapshot of the tree so far (see _snapshot), which scanning holds the
+    # directories that haven't been listed yet for.
+    # Setting stop_event ends the scan early, returning the tree found so far.
+    counter = 1
+    last_report = last_partial = time.monotonic()
+    unfinished = {}
+    scanning = {root}
+    seen_links = set()
+    links_lock = threading.Lock()
+    stack = [root]
+    pending = set()
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while stack or pending:
+            if stop_event is not None and stop_event.is_set():
+                for future in pending:
+                    future.cancel()
+                break
+            while stack and len(pending) < max_workers * 2:
+                pending.add(executor.submit(_scan_dir, stack.pop(), seen_links, links_lock))
             
-    return obj
+            done, pending = wait(pending, timeout=PROGRESS_INTERVAL,
+                                 return_when=FIRST_COMPLETED)
+            for future in done:
+                obj, entry_count, subdirs = future.result()
+                counter += entry_count
+                scanning.discard(obj)
+                if subdirs:
+                    unfinished[obj] = len(subdirs)
+                    scanning.update(subdirs)
+                    stack.extend(subdirs)
+                    continue
+                
+                # Finished a leaf directory, propagate up as far as possible.
+                # Each directory's children get sorted largest first once all
+                # their sizes are known, so the treemap never has to.
+                while obj.parent is not None:
+                    parent = obj.parent
+                    parent.size += obj.size
+                    unfinished[parent] -= 1
+                    if unfinished[parent]:
+                        break
+                    del unfinished[parent]
+                    parent.children.sort(key=attrgetter('size'), reverse=True)
+                    obj = parent
+            
+            # Report on a timer rather than every N files, so fast disks don't
+            # flood the UI and slow ones still show signs of life
+            now = time.monotonic()
+            if progress_callback and now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                process = psutil.Process()
+                mem_usage = process.memory_info().rss / 1024 / 1024
+                progress_callback(counter, mem_usage)
+            if (partial_callback and root in unfinished
+                    and now - last_partial >= PARTIAL_INTERVAL):
+                last_partial = now
+                partial_callback(_snapshot(root, unfinished, scanning))
+    
+    logger.debug("Scanned %d files in %s", counter, path)
+    
+    return root
+
+def _snapshot(root: FileInfo, unfinished: dict, scanning: set) -> PartialFileInfo:
+    # Build a tree of the scan so far that is safe to hand to another thread.
+    # Directories still in unfinished are copied, with sizes summed from what
+    # has been found below them and children sorted; finished subtrees never
+    # change again and are shared as they are. Directories in scanning have
+    # nothing to show yet and are left out.
+    top = PartialFileInfo(path=root.path, is_dir=True, name=root.name)
+    copies = [(root, top)]
+    i = 0
+    while i < len(copies):
+        obj, copy = copies[i]
+        i += 1
+        for child in obj.children:
+            if child in unfinished:
+                child_copy = PartialFileInfo(is_dir=True, parent=copy, name=child.name)
+                copies.append((child, child_copy))
+                copy.children.append(child_copy)
+            elif child not in scanning:
+                copy.children.append(child)
+    
+    # Copies come after their parent in the list, so going backwards every
+    # directory's children have their sizes before it's summed
+    for obj, copy in reversed(copies):
+        copy.size = sum(child.size for child in copy.children)
+        copy.children.sort(key=attrgetter('size'), reverse=True)
+    return top
+
+# Where scandir takes a directory file descriptor (POSIX), directories are
+# opened once and their files stat'ed relative to it with fstatat, instead of
+# the kernel walking the full path again for every file
+_SCANDIR_FD = os.scandir in os.supports_fd
+
+# Negative cache of directories scandir failed on: path -> (errno, time of the
+# failure), oldest first. Shared by all scan workers under _failed_dirs_lock.
+_failed_dirs = OrderedDict()
+_failed_dirs_lock = threading.Lock()
+
+# Only errors that will keep happening on a rescan are cached. Transient ones
+# like running out of file descriptors (EMFILE) are tried again next time.
+_CACHED_ERRNOS = frozenset((errno.EACCES, errno.EPERM, errno.ENOENT, errno.ENOTDIR))
+
+def _recently_failed(path: str) -> bool:
+    with _failed_dirs_lock:
+        failure = _failed_dirs.get(path)
+        if failure is None:
+            return False
+        if (failure[0] not in _CACHED_ERRNOS
+                or time.monotonic() - failure[1] >= FAILED_DIR_TTL):
+            del _failed_dirs[path]
+            return False
+        return True
+
+def clear_failure_cache() -> None:
+    # Forget every cached failure, so an explicit rescan tries them all again
+    with _failed_dirs_lock:
+        _failed_dirs.clear()
+
+def _remember_failure(path: str, error: OSError) -> None:
+    if error.errno not in _CACHED_ERRNOS:
+        return
+    with _failed_dirs_lock:
+        _failed_dirs[path] = (error.errno, time.monotonic())
+        _failed_dirs.move_to_end(path)
+        if len(_failed_dirs) > FAILED_DIR_CACHE_SIZE:
+            _failed_dirs.popitem(last=False)
+
+def _scan_dir(obj: FileInfo, seen_links: set,
+              links_lock: threading.Lock) -> Tuple[FileInfo, int, List[FileInfo]]:
+    # Fill in the children of one directory, returning it along with the
+    # number of entries and the subdirectories that still need scanning.
+    # obj.size is set to the total size of the files directly inside it.
+    # seen_links holds the (device, inode) of hard linked files already
+    # counted anywhere in the scan, shared by all workers under links_lock.
+    subdirs = []
+    total = 0
+    path = obj.path
+    if _recently_failed(path):
+        obj.size = 0
+        return obj, 0, subdirs
+    fd = None
+    try:
+        if _SCANDIR_FD:
+            fd = os.open(path, os.O_RDONLY | os.O_DIRECTORY)
+        with os.scandir(path if fd is None else fd) as it:
+            for entry in it:
+                # DirEntry caches d_type (and the whole stat record on Windows),
+                # so is_dir()/is_file()/is_symlink() are free and only regular
+                # files need a stat for their size. Where d_type is unknown the
+                # first check does one lstat and the others reuse it. Symlinks
+                # are skipped, other special files count as empty.
+                try:
+                    if entry.is_symlink():
+                        continue
+                    is_dir = entry.is_dir(follow_symlinks=False)
+                    size = 0
+                    if not is_dir and entry.is_file(follow_symlinks=False):
+                        st = entry.stat(follow_symlinks=False)
+                        size = st.st_size
+                        # Only count a hard linked file the first time it's seen
+                        if st.st_nlink > 1:
+                            key = (st.st_dev, st.st_ino)
+                            with links_lock:
+                                if key in seen_links:
+                                    size = 0
+                                else:
+                                    seen_links.add(key)
+                except (PermissionError, OSError):
+                    is_dir, size = False, 0
+                
+                # Names like __init__.py or .git repeat all over a tree, so
+                # they're interned to share one string
+                child = FileInfo(size=size, is_dir=is_dir, parent=obj,
+                                 name=sys.intern(entry.name))
+                obj.children.append(child)
+                total += size
+                if is_dir:
+                    subdirs.append(child)
+    except (PermissionError, OSError) as e:
+        # Only failing to open the directory is cached; an error partway
+        # through keeps the entries read so far and may well be transient
+        if not obj.children:
+            _remember_failure(path, e)
+    finally:
+        if fd is not None:
+            os.close(fd)
+    
+    obj.size = total
+    if not subdirs:
+        obj.children.sort(key=attrgetter('size'), reverse=True)
+    return obj, len(obj.children), subdirs
+
+# Tree drawing pieces for print_tree
+_BRANCH_LAST = "└── "
+_BRANCH = "├── "
+_INDENT_LAST = "    "
+_INDENT = "│   "
 
 def print_tree(root: FileInfo, indent: str = "", is_last: bool = True, dirs_only: bool = False) -> None:
     # Skip files if dirs_only is True
     if dirs_only and not root.is_dir:
         return
-        
-    prefix = "└── " if is_last else "├── "
-    size_str = f"[{root.size:,} bytes] ({root.percentage:.1f}%)"
-    print(f"{indent}{prefix}{root.path.name} {size_str}")
+    stream = sys.stdout
+    if stream is None:  # pythonw has no console
+        return
+    
+    # Lines are built with an explicit stack and written out in 64 KiB chunks,
+    # instead of one print() per node and a recursive call per level. Children
+    # are pushed in reverse so they come off in order.
+    # Chunks go to the stream's binary buffer encoded in the stream's own
+    # encoding, characters it can't show replaced; streams without a buffer
+    # (like a StringIO) get the text as it is.
+    # Percentages are of the whole scanned tree, like FileInfo.percentage,
+    # with the scale worked out once.
+    top = root
+    while top.parent is not None:
+        top = top.parent
+    scale = 100.0 / top.size if top.size > 0 else 0.0
+    
+    out = getattr(stream, "buffer", None)
+    if out is not None:
+        encoding = getattr(stream, "encoding", None) or "utf-8"
+        stream.flush()
+        def write(text: str) -> None:
+            out.write(text.encode(encoding, errors="replace"))
+    else:
+        write = stream.write
     
-    child_indent = indent + ("    " if is_last else "│   ")
-    # Filter children if dirs_only
-    children = [c for c in root.children if not dirs_only or c.is_dir]
-    for i, child in enumerate(children):
-        print_tree(child, child_indent, i == len(children) - 1, dirs_only)
+    lines = []
+    buffered = 0
+    stack = [(root, indent, is_last)]
+    while stack:
+        node, node_indent, node_is_last = stack.pop()
+        line = (f"{node_indent}{_BRANCH_LAST if node_is_last else _BRANCH}{node.name} "
+                f"[{node.size:,} bytes] ({node.size * scale:.1f}%)\n")
+        lines.append(line)
+        buffered += len(line)
+        if buffered > 65536:
+            write("".join(lines))
+            lines.clear()
+            buffered = 0
+        
+        children = node.children
+        if not children:
+            continue
+        child_indent = node_indent + (_INDENT_LAST if node_is_last else _INDENT)
+        # Filter children if dirs_only; otherwise the list is used as it is
+        # rather than copied for every node
+        if dirs_only:
+            children = [c for c in children if c.is_dir]
+        last = len(children) - 1
+        for i in range(last, -1, -1):
+            stack.append((children[i], child_indent, i == last))
+    write("".join(lines))
+    if out is not None:
+        out.flush()
+    else:
+        stream.flush()
  
 
-def calculate_percentages(root: FileInfo) -> None:
-    total_size = root.size  # Root size is the reference
+_UNITS = ("B", "KB", "MB", "GB", "TB", "PB")
+_DIV = tuple(1024 ** i for i in range(len(_UNITS)))
+
+def format_size(size: int) -> str:
+    # Every unit is 2**10 of the one before, so the bit length picks it
+    # directly instead of dividing in a loop
+    i = min(max(int(size).bit_length() - 1, 0) // 10, len(_UNITS) - 1)
+    return f"{size / _DIV[i]:.2f} {_UNITS[i]}"
+
+def squarify(sizes: List[int], total_size: int, x: float, y: float,
+             width: float, height: float) -> List[Tuple[float, float, float, float]]:
+    # Squarified layout (Bruls et al.) of sizes, which must be sorted largest
+    # first, inside the given rectangle. Items are packed into rows along the
+    # shorter side of the remaining space, and a row keeps growing while that
+    # improves its worst aspect ratio. That ratio only depends on the row's
+    # total, largest and smallest area, so each step is O(1).
+    # Returns (x, y, width, height) for the leading items; the rest would be
+    # smaller than a pixel and are left out.
+    rects = []
+    if total_size <= 0:
+        return rects
     
-    def _calc_percentage(node: FileInfo) -> None:
-        # Avoid division by zero
-        if total_size > 0:
-            node.percentage = (node.size / total_size) * 100
+    scale = width * height / total_size  # Pixels of area per byte
+    count = len(sizes)
+    i = 0
+    # Sizes are sorted, so once one would be smaller than a pixel all the ones
+    # after it are too
+    while i < count and sizes[i] * scale >= 1:
+        short_side = min(width, height)
+        if short_side <= 0:
+            break
+        side2 = short_side * short_side
+        
+        row_max = sizes[i] * scale
+        row_sum = row_max
+        worst = max(side2 / row_max, row_max / side2)
+        j = i + 1
+        while j < count and sizes[j] * scale >= 1:
+            area = sizes[j] * scale
+            new_sum = row_sum + area
+            new_worst = max(side2 * row_max / (new_sum * new_sum),
+                            new_sum * new_sum / (side2 * area))
+            if new_worst > worst:
+                break
+            row_sum, worst = new_sum, new_worst
+            j += 1
+        
+        # Lay the row out across the short side, then shrink the space left.
+        # Every item in the row gets length = size * scale / thickness, so fold
+        # that into one factor per row.
+        thickness = row_sum / short_side
+        length_per_byte = scale / thickness
+        if width >= height:
+            y_offset = y
+            for size in sizes[i:j]:
+                item_height = size * length_per_byte
+                rects.append((x, y_offset, thickness, item_height))
+                y_offset += item_height
+            x += thickness
+            width -= thickness
         else:
-            node.percentage = 0.0
-            
-        if node.is_dir:
-            for child in node.children:
-                _calc_percentage(child)
-    
-    # Add percentage field to FileInfo class first
-    FileInfo.percentage = field(default=0.0)
+            x_offset = x
+            for size in sizes[i:j]:
+                item_width = size * length_per_byte
+                rects.append((x_offset, y, item_width, thickness))
+                x_offset += item_width
+            y += thickness
+            height -= thickness
+        i = j
     
-    # Start calculation from root
-    _calc_percentage(root)
+    return rects
 
-def format_size(size: int) -> str:
-    for unit in ['B', 'KB', 'MB', 'GB', 'TB']:
-        if size < 1024:
-            return f"{size:.2f} {unit}"
-        size /= 1024
-    return f"{size:.2f} PB"
+class _TreemapLayer:
+    # The rectangles at one depth of the treemap, grouped by how they are
+    # painted. The per-color lists are indexed like TreemapView.border_colors.
+    __slots__ = ('folders', 'partial_folders', 'blocks', 'files', 'others', 'labels')
+
+    def __init__(self, color_count: int):
+        self.folders = [[] for _ in range(color_count)]
+        self.partial_folders = [[] for _ in range(color_count)]
+        self.blocks = [[] for _ in range(color_count)]
+        self.files = [[] for _ in range(color_count)]
+        self.others = []
+        self.labels = []
 
-class TreemapView(QGraphicsView):
+class TreemapView(QWidget):
     def __init__(self, root_info: FileInfo):
         super().__init__()
-        self.scene = QGraphicsScene()
-        self.setScene(self.scene)
         self.root_info = root_info
+        self.pixmap = None
+        self._layers = []
+        # (tree, width, height, device pixel ratio) the current pixmap was drawn for
+        self._drawn_for = None
+        self._max_depth = None
+        self._reset_hit_grid(0, 0)
         
         # Define colors for files and folder borders
         self.border_colors = [
@@ -118,119 +501,305 @@ class TreemapView(QGraphicsView):
             QColor("#CCE5FF"),  # Light blue
             QColor("#22ff3e")   # Light green
         ]
+        # For each parent folder color, the colors its subfolders alternate between
+        self.available_colors = [
+            [i for i in range(len(self.border_colors)) if i != parent_color]
+            for parent_color in range(len(self.border_colors))
+        ]
+        # Pens and brushes are built once per color and reused for every item.
+        # The file gradient uses bounding box coordinates, so one brush per
+        # color fits rectangles of any size.
+        self.border_pens = [QPen(color) for color in self.border_colors]
+        self.file_fill_brushes = [QBrush(color) for color in self.file_colors]
+        self.other_brush = QBrush(QColor("#c0c0c0"))
+        # Folders of a partial tree are still being scanned and get hatched
+        self.partial_brush = QBrush(QColor("#c0c0c0"), Qt.BDiagPattern)
+        self.file_gradient_brushes = []
+        for color in self.file_colors:
+            gradient = QLinearGradient(0, 0, 1, 1)
+            gradient.setCoordinateMode(QGradient.ObjectBoundingMode)
+            gradient.setColorAt(0, color)
+            gradient.setColorAt(0.5, color.lighter(150))
+            gradient.setColorAt(1, color.darker(150))
+            self.file_gradient_brushes.append(QBrush(gradient))
         
         # Create info label with fixed height and expanding width
         self.info_label = QLabel("")
         self.info_label.setMinimumWidth(self.window().width())
         self.info_label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Fixed)
         
-        self.draw_treemap()
+        self.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
         
-        # Enable viewport update on resize
-        self.setViewportUpdateMode(QGraphicsView.FullViewportUpdate)
+        # A drag-resize sends a burst of resize events; the treemap is only
+        # redrawn once the size has settled for a moment
+        self._resize_timer = QTimer(self)
+        self._resize_timer.setSingleShot(True)
+        self._resize_timer.setInterval(50)
+        self._resize_timer.timeout.connect(self.draw_treemap)
         
-        # Fit scene in viewport
-        self.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
-        self.setVerticalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.draw_treemap()
 
     def resizeEvent(self, event):
         super().resizeEvent(event)
-        self.draw_treemap()
+        self._resize_timer.start()
         
-    def draw_treemap(self):
-        self.scene.clear()
-        rect = self.viewport().rect()
-        self._draw_item(self.root_info, QRectF(0, 0, rect.width(), rect.height()), 0)
-        self.setSceneRect(self.scene.itemsBoundingRect())
-        self.fitInView(self.scene.itemsBoundingRect(), Qt.KeepAspectRatio)
-
-    def _draw_item(self, item: FileInfo, rect: QRectF, depth: int) -> None:
+    def paintEvent(self, event):
+        # Repaints just blit the treemap rendered by draw_treemap. While a
+        # resize is pending the old pixmap is stretched over the new size as
+        # a rough preview.
+        if self.pixmap is not None:
+            painter = QPainter(self)
+            if self.pixmap.deviceIndependentSize().toSize() == self.size():
+                painter.drawPixmap(0, 0, self.pixmap)
+            else:
+                painter.drawPixmap(self.rect(), self.pixmap)
+            painter.end()
+
+    def draw_treemap(self, max_depth: Optional[int] = None):
+        # The whole treemap is rendered once into a pixmap that paintEvent
+        # shows, instead of keeping a graphics item per file and folder.
+        # Clicks are resolved through a grid of the file rectangles recorded
+        # while laying out.
+        # The layout only depends on the tree and the size, so if neither
+        # changed (say a resize that ended where it started) the pixmap and
+        # hit grid are still good. Scaling an old layout to a new size would
+        # not be: the squarified rows and what is too small to show both
+        # depend on the exact width and height.
+        # With max_depth, folders that deep are drawn as solid blocks instead
+        # of being laid out, for quick previews.
+        rect = self.rect()
+        # On HiDPI screens the pixmap gets the screen's device pixels so it is
+        # shown without being upscaled; layout and hit grid stay in logical
+        # coordinates, the painter maps them
+        dpr = self.devicePixelRatioF()
+        drawn_for = (self.root_info, rect.width(), rect.height(), dpr, max_depth)
+        if self.pixmap is not None and drawn_for == self._drawn_for:
+            self.update()
+            return
+        self._drawn_for = drawn_for
+        self.pixmap = None
+        self._reset_hit_grid(rect.width(), rect.height())
         if rect.width() < 1 or rect.height() < 1:
+            self.update()
             return
+        
+        pixmap = QPixmap(round(rect.width() * dpr), round(rect.height() * dpr))
+        pixmap.setDevicePixelRatio(dpr)
+        pixmap.fill(Qt.white)
+        painter = QPainter(pixmap)
+        # File names are only drawn where a few characters fit, measured once
+        # per draw rather than per label
+        metrics = painter.fontMetrics()
+        self._font_metrics = metrics
+        self._label_min_height = metrics.height() + 2
+        self._label_min_width = metrics.averageCharWidth() * 6
+        try:
+            # Lay out the whole tree first, then paint it in batches. Items
+            # waiting to be laid out are kept on an explicit stack rather than
+            # recursing per folder, so long chains of nested folders can't hit
+            # the recursion limit.
+            self._layers = []
+            self._max_depth = max_depth
+            pending = [(self.root_info, QRectF(0, 0, rect.width(), rect.height()), 0, 0, 0)]
+            draw_item = self._draw_item
+            while pending:
+                draw_item(pending, *pending.pop())
+            self._paint_layers(painter)
+        finally:
+            self._layers = []
+            self._max_depth = None
+            painter.end()
+        
+        self.pixmap = pixmap
+        self.update()
+
+    def _paint_layers(self, painter: QPainter) -> None:
+        # Items only ever overlap their own ancestors, so painting the tree one
+        # depth at a time looks the same as painting it item by item, and all
+        # rectangles of one style at a depth go out in a single drawRects call
+        for layer in self._layers:
+            painter.setBrush(Qt.NoBrush)
+            for pen, rects in zip(self.border_pens, layer.folders):
+                if rects:
+                    painter.setPen(pen)
+                    painter.drawRects(rects)
+            painter.setBrush(self.partial_brush)
+            for pen, rects in zip(self.border_pens, layer.partial_folders):
+                if rects:
+                    painter.setPen(pen)
+                    painter.drawRects(rects)
+            for pen, brush, rects in zip(self.border_pens, self.file_fill_brushes, layer.blocks):
+                if rects:
+                    painter.setPen(pen)
+                    painter.setBrush(brush)
+                    painter.drawRects(rects)
+            
+            painter.setPen(Qt.NoPen)
+            for brush, rects in zip(self.file_gradient_brushes, layer.files):
+                if rects:
+                    painter.setBrush(brush)
+                    painter.drawRects(rects)
+            if layer.others:
+                painter.setBrush(self.other_brush)
+                painter.drawRects(layer.others)
+            
+            if layer.labels:
+                painter.setPen(Qt.black)
+                for label_rect, label in layer.labels:
+                    painter.drawText(label_rect, Qt.AlignLeft | Qt.AlignVCenter, label)
+
+    def _layer(self, depth: int) -> '_TreemapLayer':
+        # Items are laid out depth first, so a new depth is always one deeper
+        # than any seen so far
+        layers = self._layers
+        if depth == len(layers):
+            layers.append(_TreemapLayer(len(self.border_colors)))
+        return layers[depth]
+
+    def _add_label(self, layer: '_TreemapLayer', rect: QRectF, text: str) -> None:
+        # Label an item if its name can be read, cut to fit with an ellipsis
+        if rect.height() >= self._label_min_height and rect.width() >= self._label_min_width:
+            label_rect = rect.adjusted(2, 0, -2, 0)
+            label = self._font_metrics.elidedText(
+                text, Qt.ElideRight, int(label_rect.width())
+            )
+            layer.labels.append((label_rect, label))
+
+    def _draw_item(self, pending: list, item: FileInfo, rect: QRectF, depth: int,
+                   parent_color: int = 0, sibling_index: int = 0) -> None:
+        if rect.width() < 1 or rect.height() < 1:
+            return
+
+        # parent_color is the color index of the folder being laid out and
+        # sibling_index the number of folders before this item in it, both
+        # passed down so they aren't worked out again for every item
 
         # For root folder, start with first color
         if not item.parent:
             color_index = 0
         # For files, use parent's color
         elif not item.is_dir:
-            color_index = self._get_folder_color_index(item.parent)
+            color_index = parent_color
         # For folders, alternate between colors not used by parent
         else:
-            parent_color = self._get_folder_color_index(item.parent)
-            available_colors = [i for i in range(len(self.border_colors)) if i != parent_color]
-            sibling_index = sum(1 for sibling in item.parent.children[:item.parent.children.index(item)] if sibling.is_dir)
+            available_colors = self.available_colors[parent_color]
             color_index = available_colors[sibling_index % len(available_colors)]
 
+        layer = self._layer(depth)
         if item.is_dir:
-            # Draw directory with transparent background and colored border
-            rect_item = self.scene.addRect(
-                rect,
-                QPen(self.border_colors[color_index]),
-                QBrush(Qt.transparent)
-            )
-            self._layout_children(item, rect, depth + 1)
+            if (rect.width() * rect.height() >= MIN_RECT_AREA
+                    and (self._max_depth is None or depth < self._max_depth)):
+                # Draw directory with transparent background and colored border
+                if isinstance(item, PartialFileInfo):
+                    layer.partial_folders[color_index].append(rect)
+                else:
+                    layer.folders[color_index].append(rect)
+                self._layout_children(pending, item, rect, depth + 1, color_index)
+            else:
+                # Children of a directory this small could never be seen (or
+                # are deeper than wanted), so don't lay them out and show it as
+                # one solid block instead
+                layer.blocks[color_index].append(rect)
         else:
-            gradient = QLinearGradient(rect.topLeft(), rect.bottomRight())
-            base_color = self.file_colors[color_index]
-            darker = base_color.darker(150)
-            lighter = base_color.lighter(150)
-            
-            gradient.setColorAt(0.5, lighter)
-            gradient.setColorAt(0, base_color)
-            gradient.setColorAt(1, darker)
+            layer.files[color_index].append(rect)
+            self._add_label(layer, rect, item.name)
             
-            rect_item = self.scene.addRect(
-                rect,
-                QPen(Qt.transparent),
-                QBrush(gradient)
-            )
-            
-            rect_item.setAcceptHoverEvents(True)
-            rect_item.setData(0, item)
+            # Remember where the file went, for mousePressEvent
+            self._add_hit_rect(rect, item)
 
-    def _layout_children(self, dir_item: FileInfo, rect: QRectF, depth: int):
-        if not dir_item.children:
+    def _layout_children(self, pending: list, dir_item: FileInfo, rect: QRectF, depth: int,
+                         color_index: int):
+        # Children are added to pending for draw_treemap to lay out in turn
+        # A directory's size is already the sum of all its children (both
+        # files and directories), so there is no need to add them up again
+        total_size = dir_item.size
+        if not dir_item.children or total_size <= 0:
             return
             
-        x, y = rect.x(), rect.y()
-        width, height = rect.width(), rect.height()
-        
-        # Use all children (both files and directories)
-        total_size = sum(child.size for child in dir_item.children)
+        if rect.width() < 2 or rect.height() < 2:
+            return
         
-        if width > height:
-            x_offset = x
-            for child in dir_item.children:
-                child_width = width * (child.size / total_size)
-                self._draw_item(child, QRectF(x_offset, y, child_width, height), depth)
-                x_offset += child_width
-        else:
-            y_offset = y
-            for child in dir_item.children:
-                child_height = height * (child.size / total_size)
-                self._draw_item(child, QRectF(x, y_offset, width, child_height), depth)
-                y_offset += child_height
+        # Children are sorted largest first by the scan, so the ones big enough
+        # to cover a pixel are a prefix of the list. Only read their sizes,
+        # instead of touching every child of very wide directories.
+        children = dir_item.children
+        min_size = total_size * MIN_CHILD_AREA / (rect.width() * rect.height())
+        sizes = []
+        for child in children:
+            if child.size < min_size:
+                break
+            sizes.append(child.size)
+        # Everything after that prefix shares one block at the end. It may be
+        # bigger than the last child, which only makes its row a little less
+        # square.
+        shown = len(sizes)
+        small_count = len(children) - shown
+        small_size = total_size - sum(sizes)
+        has_other = small_count > 0 and small_size > 0
+        if has_other:
+            sizes.append(small_size)
+        rects = squarify(sizes, total_size,
+                         rect.x(), rect.y(), rect.width(), rect.height())
+        sibling_index = 0
+        for child, (x, y, width, height) in zip(children, rects[:shown]):
+            pending.append((child, QRectF(x, y, width, height), depth, color_index,
+                            sibling_index))
+            if child.is_dir:
+                sibling_index += 1
+        if has_other and len(rects) == len(sizes):
+            self._draw_other(dir_item, QRectF(*rects[-1]), depth, small_count, small_size)
+
+    def _draw_other(self, dir_item: FileInfo, rect: QRectF, depth: int,
+                    count: int, size: int) -> None:
+        # The block standing in for a directory's children too small to draw.
+        # It gets a stand-in FileInfo so clicking it shows what it holds.
+        if rect.width() < 1 or rect.height() < 1:
+            return
+        other = FileInfo(size=size, parent=dir_item, name=f"… {count:,} items")
+        layer = self._layer(depth)
+        layer.others.append(rect)
+        self._add_label(layer, rect, other.name)
+        self._add_hit_rect(rect, other)
+
+    def _reset_hit_grid(self, width: int, height: int) -> None:
+        # Uniform grid over the viewport: each cell lists the file rectangles
+        # overlapping it, so a click only checks the handful in its own cell
+        self.grid_cols = max(1, math.ceil(width / HIT_GRID_CELL))
+        rows = max(1, math.ceil(height / HIT_GRID_CELL))
+        self.hit_grid = [[] for _ in range(self.grid_cols * rows)]
+
+    def _add_hit_rect(self, rect: QRectF, item: FileInfo) -> None:
+        entry = (rect, item)
+        rows = len(self.hit_grid) // self.grid_cols
+        first_col = int(rect.left()) // HIT_GRID_CELL
+        last_col = min(int(rect.right()) // HIT_GRID_CELL, self.grid_cols - 1)
+        first_row = int(rect.top()) // HIT_GRID_CELL
+        last_row = min(int(rect.bottom()) // HIT_GRID_CELL, rows - 1)
+        for row in range(first_row, last_row + 1):
+            offset = row * self.grid_cols
+            for col in range(first_col, last_col + 1):
+                self.hit_grid[offset + col].append(entry)
 
     def mousePressEvent(self, event):
-        item = self.scene.itemAt(self.mapToScene(event.position().toPoint()), self.transform())
-        if item:
-            file_info = item.data(0)
-            if file_info:
+        # The pixmap is drawn at the widget's origin in logical coordinates
+        pos = event.position()
+        col = int(pos.x()) // HIT_GRID_CELL
+        row = int(pos.y()) // HIT_GRID_CELL
+        cell_index = row * self.grid_cols + col
+        if 0 <= col < self.grid_cols and 0 <= cell_index < len(self.hit_grid):
+            candidates = self.hit_grid[cell_index]
+        else:
+            candidates = []
+        for rect, file_info in candidates:
+            if rect.contains(pos):
                 size_str = format_size(file_info.size)
-                path_str = str(file_info.path)
+                path_str = file_info.path
                 if len(path_str) > 100:
                     path_str = path_str[:50] + "..." + path_str[-47:]
                 self.info_label.setText(f"{path_str} ({size_str})")
+                break
         super().mousePressEvent(event)
 
-    def _get_folder_color_index(self, folder: FileInfo) -> int:
-        if not folder.parent:
-            return 0
-        parent_color = self._get_folder_color_index(folder.parent)
-        available_colors = [i for i in range(len(self.border_colors)) if i != parent_color]
-        sibling_index = sum(1 for sibling in folder.parent.children[:folder.parent.children.index(folder)] if sibling.is_dir)
-        return available_colors[sibling_index % len(available_colors)]
-
 class DirectoryBrowser(QWidget):
     def __init__(self, parent=None):
         super().__init__(parent)
@@ -258,6 +827,29 @@ class DirectoryBrowser(QWidget):
             
         layout.addWidget(self.tree_view)
 
+class ScanWorker(QObject):
+    # Scans a directory off the GUI thread and reports back through signals.
+    # Setting stop_event makes the scan end early.
+    progress = Signal(int, float)
+    partial = Signal(object)
+    finished = Signal(object)
+
+    def __init__(self, path: str, stop_event: threading.Event):
+        super().__init__()
+        self.path = path
+        self.stop_event = stop_event
+
+    def run(self):
+        # finished is always emitted, even if the scan fails, so the window
+        # never waits on a scan that is gone
+        root = FileInfo(path=self.path)
+        try:
+            root = traverse_directory(self.path, progress_callback=self.progress.emit,
+                                      partial_callback=self.partial.emit,
+                                      stop_event=self.stop_event)
+        finally:
+            self.finished.emit(root)
+
 class MainWindow(QMainWindow):
     def __init__(self, root_info: FileInfo):
         super().__init__()
@@ -304,22 +896,34 @@ class MainWindow(QMainWindow):
         self.status_bar.addWidget(self.count_label)
         self.status_bar.addWidget(self.progress_label)
         self.update_status_info(root_info)
+        
+        self.scan_thread = None
+        self.scan_worker = None
+        self.scan_stop = threading.Event()
+        
+        # Only the latest partial tree is kept, and drawn from a timer so
+        # snapshots that arrive while one is waiting just replace it
+        self._partial_root = None
+        self._partial_done = 0.0
+        self._partial_gap = PARTIAL_MIN_GAP
+        self._partial_timer = QTimer(self)
+        self._partial_timer.setSingleShot(True)
+        self._partial_timer.timeout.connect(self.draw_partial)
 
     def update_status_info(self, root: FileInfo):
-        # Calculate total files and folders
-        file_count = 0
+        # Calculate total files and folders with an explicit stack, so deep
+        # trees can't hit the recursion limit
+        file_count = 0 if root.is_dir else 1
         folder_count = 0
-        
-        def count_items(node: FileInfo):
-            nonlocal file_count, folder_count
-            if node.is_dir:
-                folder_count += 1
-                for child in node.children:
-                    count_items(child)
-            else:
-                file_count += 1
-        
-        count_items(root)
+        stack = [root] if root.is_dir else []
+        while stack:
+            node = stack.pop()
+            folder_count += 1
+            for child in node.children:
+                if child.is_dir:
+                    stack.append(child)
+                else:
+                    file_count += 1
         
         # Format size
         total_size = format_size(root.size)
@@ -328,29 +932,81 @@ class MainWindow(QMainWindow):
 
     def scan_selected_directory(self):
         index = self.dir_browser.tree_view.currentIndex()
-        if index.isValid():
-            print("Starting scan...")  # Debug
-            
-            def progress_callback(files_scanned: int, memory_mb: float):
-                print(f"Progress callback: {files_scanned} files")  # Debug
-                self.progress_label.setText(
-                    f"Scanning... Files: {files_scanned:,} | Memory: {memory_mb:.1f} MB"
-                )
-                self.status_bar.update()
-                QApplication.processEvents()
+        if index.isValid() and self.scan_thread is None:
+            logger.debug("Starting scan")
+            # The user may have fixed permissions since the last scan
+            clear_failure_cache()
             
-            path = Path(self.dir_browser.model.filePath(index))
-            root = traverse_directory(path, counter=[0], progress_callback=progress_callback)
-            print("Scan complete")  # Debug
-            calculate_percentages(root)
-            self.treemap_view.root_info = root
-            self.treemap_view.draw_treemap()
-            self.update_status_info(root)
-            self.progress_label.clear()
-            self.status_bar.update()  # Update one final time
+            # The scan runs on its own thread; progress and the finished tree
+            # come back as signals, which Qt delivers on the GUI thread
+            path = self.dir_browser.model.filePath(index)
+            self.scan_stop = threading.Event()
+            self.scan_thread = QThread(self)
+            self.scan_worker = ScanWorker(path, self.scan_stop)
+            self.scan_worker.moveToThread(self.scan_thread)
+            self.scan_thread.started.connect(self.scan_worker.run)
+            self.scan_worker.progress.connect(self.on_scan_progress)
+            self.scan_worker.partial.connect(self.on_scan_partial)
+            self.scan_worker.finished.connect(self.on_scan_finished)
+            self.scan_worker.finished.connect(self.scan_thread.quit)
+            self.scan_thread.finished.connect(self.scan_worker.deleteLater)
+            self.scan_thread.finished.connect(self.scan_thread.deleteLater)
+            self.dir_browser.scan_button.setEnabled(False)
+            self.scan_thread.start()
+
+    def on_scan_progress(self, files_scanned: int, memory_mb: float):
+        self.progress_label.setText(
+            f"Scanning... Files: {files_scanned:,} | Memory: {memory_mb:.1f} MB"
+        )
+
+    def on_scan_partial(self, root: FileInfo):
+        # Show the tree so far; it's replaced by the full one when done
+        self._partial_root = root
+        if not self._partial_timer.isActive():
+            wait = self._partial_gap - (time.monotonic() - self._partial_done)
+            self._partial_timer.start(max(0, int(wait * 1000)))
+
+    def draw_partial(self):
+        root = self._partial_root
+        self._partial_root = None
+        if root is None or self.scan_thread is None:
+            return
+        started = time.monotonic()
+        self.treemap_view.root_info = root
+        self.treemap_view.draw_treemap(max_depth=PARTIAL_MAX_DEPTH)
+        self._partial_done = time.monotonic()
+        # The next one waits at least as long as this one took to draw
+        self._partial_gap = max(PARTIAL_MIN_GAP, self._partial_done - started)
+
+    def on_scan_finished(self, root: FileInfo):
+        logger.debug("Scan complete")
+        self.scan_thread = None
+        self.scan_worker = None
+        self._partial_timer.stop()
+        self._partial_root = None
+        if self.scan_stop.is_set():
+            # Stopped because the window is closing
+            return
+        self.treemap_view.root_info = root
+        self.treemap_view.draw_treemap()
+        self.update_status_info(root)
+        self.progress_label.clear()
+        self.dir_browser.scan_button.setEnabled(
+            self.dir_browser.tree_view.currentIndex().isValid())
+
+    def closeEvent(self, event):
+        # Stop a running scan and wait for its thread, Qt aborts if a QThread
+        # is destroyed while still running
+        if self.scan_thread is not None:
+            self.scan_stop.set()
+            self.scan_thread.quit()
+            self.scan_thread.wait()
+        super().closeEvent(event)
 
     def on_directory_selected(self, index):
-        self.dir_browser.scan_button.setEnabled(index.isValid())
+        # The button stays disabled while a scan runs, on_scan_finished turns
+        # it back on
+        self.dir_browser.scan_button.setEnabled(index.isValid() and self.scan_thread is None)
 
     def on_scan_clicked(self):
         # Clear info label before starting scan
@@ -358,9 +1014,16 @@ class MainWindow(QMainWindow):
         self.scan_selected_directory()
 
 def main():
+    # Diagnostics are off unless asked for, e.g. LOG_LEVEL=DEBUG
+    level_name = os.environ.get("LOG_LEVEL", "WARNING").upper()
+    level = logging.getLevelName(level_name)
+    logging.basicConfig(level=level if isinstance(level, int) else logging.WARNING)
+    if not isinstance(level, int):
+        logger.warning("Ignoring LOG_LEVEL=%r, expected a level like DEBUG or INFO",
+                       os.environ["LOG_LEVEL"])
     app = QApplication(sys.argv)
     # Create window with empty root (or minimal placeholder)
-    window = MainWindow(FileInfo(path=Path.home()))
+    window = MainWindow(FileInfo(path=os.path.expanduser("~")))
     window.show()
     sys.exit(app.exec())
 
@@ -0,0 +1,36 @@
+import errno
+import importlib.util
+import unittest
+
+# sizegraphv2 imports PySide6 and psutil at module level
+HAVE_DEPS = all(importlib.util.find_spec(name) for name in ("PySide6", "psutil"))
+
+if HAVE_DEPS:
+    import sizegraphv2
+
+
+@unittest.skipUnless(HAVE_DEPS, "PySide6 and psutil are required")
+class FailureCacheTest(unittest.TestCase):
+    def setUp(self):
+        sizegraphv2.clear_failure_cache()
+
+    def tearDown(self):
+        sizegraphv2.clear_failure_cache()
+
+    def test_clear_forgets_cached_failure(self):
+        path = "/no/such/dir"
+        sizegraphv2._remember_failure(path, PermissionError(errno.EACCES, "denied"))
+        self.assertTrue(sizegraphv2._recently_failed(path))
+
+        sizegraphv2.clear_failure_cache()
+
+        self.assertFalse(sizegraphv2._recently_failed(path))
+
+    def test_transient_failure_is_not_cached(self):
+        path = "/no/such/dir"
+        sizegraphv2._remember_failure(path, OSError(errno.EMFILE, "too many open files"))
+        self.assertFalse(sizegraphv2._recently_failed(path))
+
+
+if __name__ == "__main__":
+    unittest.main()